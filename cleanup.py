@@ -1,107 +1,277 @@
+import argparse
+import re
 import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from datetime import datetime, timezone, timedelta
 
 REGION = "us-east-1"
 BASE_NAME = "word-analysis"
+TTL_HOURS = 24
+MAX_WORKERS = 16
+# Each bucket being emptied runs its delete_objects batches on a small pool of
+# its own, nested inside the MAX_WORKERS pool that handles buckets
+S3_DELETE_WORKERS = 4
+# Likewise each role lists, then deletes or detaches, its inline and managed
+# policies two at a time
+IAM_POLICY_WORKERS = 2
 
-s3_client = boto3.client("s3", region_name=REGION)
-sns_client = boto3.client("sns")
-lambda_client = boto3.client("lambda", region_name=REGION)
-iam_client = boto3.client("iam")
-dynamodb_client = boto3.client("dynamodb")
-sts_client = boto3.client("sts")
-account_id = sts_client.get_caller_identity()["Account"]
+# Keep-alive connections and adaptive retries; each client's pool must cover
+# its real concurrency (every outer worker plus its nested workers) or urllib3
+# discards connections
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 10},
+    max_pool_connections=MAX_WORKERS * (1 + max(S3_DELETE_WORKERS, IAM_POLICY_WORKERS)),
+)
 
-cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+# One session resolves credentials once for every client. Low-level clients
+# are thread-safe, so the worker threads share these
+session = boto3.Session()
+s3_client = session.client("s3", region_name=REGION, config=CLIENT_CONFIG)
+sns_client = session.client("sns", config=CLIENT_CONFIG)
+lambda_client = session.client("lambda", region_name=REGION, config=CLIENT_CONFIG)
+iam_client = session.client("iam", config=CLIENT_CONFIG)
+dynamodb_client = session.client("dynamodb", config=CLIENT_CONFIG)
+events_client = session.client("events", region_name=REGION, config=CLIENT_CONFIG)
+
+# Error codes meaning the resource is already gone; anything else is a real failure
+NOT_FOUND_CODES = {'NoSuchEntity', 'NoSuchBucket', 'NotFound', 'ResourceNotFoundException'}
+
+# deploy.py names end in -<epoch seconds>, with -warmer appended for warmer rules
+NAME_TIMESTAMP_RE = re.compile(r"-(\d+)(?:-warmer)?$")
+
+# delete_objects accepts at most 1000 keys per request
+S3_DELETE_BATCH_SIZE = 1000
+
+def paginate(client, operation, result_key, **kwargs):
+    """Yield every item under result_key across all pages of a list operation."""
+    pages = client.get_paginator(operation).paginate(**kwargs)
+    return chain.from_iterable(page.get(result_key, []) for page in pages)
+
+def search(client, operation, expression, **kwargs):
+    """Yield the items matched by a JMESPath expression across all pages of a list operation."""
+    pages = client.get_paginator(operation).paginate(**kwargs)
+    return (item for item in pages.search(expression) if item is not None)
+
+def run_parallel(func, items, describe=str, max_workers=MAX_WORKERS):
+    """Apply func to every item on a thread pool and return the results in order.
+
+    An AWS failure on one item is logged (naming it via describe) and yields
+    None; it does not stop the others. Throttling is retried by the client
+    config before it gets here.
+    """
+    def _safe(item):
+        try:
+            return func(item)
+        except (ClientError, BotoCoreError) as e:
+            print(f"Failed on {describe(item)}: {e}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_safe, items))
+
+def _empty_bucket(bucket):
+    """Delete every object version and delete marker in a bucket, one page per delete_objects call.
+
+    A single list_object_versions pass covers both versions and delete markers;
+    each page is handed to the pool as soon as it arrives, so listing and
+    deletion overlap.
+    """
+    delete_objects = s3_client.delete_objects
+    def _delete(batch):
+        # Quiet mode still reports per-key failures, in Errors, without raising
+        response = delete_objects(Bucket=bucket, Delete={'Objects': batch, 'Quiet': True})
+        for err in response.get('Errors', []):
+            print(f"Failed to delete s3://{bucket}/{err['Key']} (version {err.get('VersionId')}): "
+                  f"{err['Code']} {err.get('Message', '')}")
+    pages = s3_client.get_paginator('list_object_versions').paginate(
+        Bucket=bucket, PaginationConfig={'PageSize': S3_DELETE_BATCH_SIZE})
+    batches = ([{'Key': v['Key'], 'VersionId': v['VersionId']}
+                for v in page.get('Versions', []) + page.get('DeleteMarkers', [])]
+               for page in pages)
+    run_parallel(_delete, (batch for batch in batches if batch),
+                 describe=lambda batch: f"{len(batch)} object(s) in bucket {bucket}",
+                 max_workers=S3_DELETE_WORKERS)
+
+def in_scope(name, created, cutoff, timestamp):
+    """Select by the deployment timestamp deploy.py puts in names when one is given, else by creation time."""
+    if timestamp is not None:
+        return re.search(rf"-{timestamp}(?:-|$)", name) is not None
+    return created is not None and created >= cutoff
+
+def name_created_at(name):
+    """Creation time encoded in a deploy.py resource name, for services that report none; None if absent."""
+    match = NAME_TIMESTAMP_RE.search(name)
+    return datetime.fromtimestamp(int(match.group(1)), timezone.utc) if match else None
+
+def delete_lambda(fn_name):
+    print(f"Deleting Lambda: {fn_name}")
+    lambda_client.delete_function(FunctionName=fn_name)
+
+def delete_role(role_name):
+    print(f"Deleting IAM role: {role_name}")
+    # Bounded by IAM_POLICY_WORKERS, which CLIENT_CONFIG's pool accounts for
+    with ThreadPoolExecutor(max_workers=IAM_POLICY_WORKERS) as executor:
+        # List inline and managed policies at the same time
+        inline = executor.submit(lambda: list(paginate(iam_client, 'list_role_policies', 'PolicyNames', RoleName=role_name)))
+        attached = executor.submit(lambda: list(paginate(iam_client, 'list_attached_role_policies', 'AttachedPolicies', RoleName=role_name)))
+        # Delete inline policies and detach managed policies together
+        futures = [executor.submit(iam_client.delete_role_policy, RoleName=role_name, PolicyName=pol)
+                   for pol in inline.result()]
+        futures += [executor.submit(iam_client.detach_role_policy, RoleName=role_name, PolicyArn=pol['PolicyArn'])
+                    for pol in attached.result()]
+        for future in futures:
+            future.result()
+    # Delete role
+    iam_client.delete_role(RoleName=role_name)
+
+def delete_bucket(bucket_name):
+    print(f"Deleting S3 bucket: {bucket_name}")
+    # Delete objects (including versioned)
+    try:
+        _empty_bucket(bucket_name)
+    except s3_client.exceptions.NoSuchBucket:
+        pass
+    # Delete bucket
+    s3_client.delete_bucket(Bucket=bucket_name)
+
+def unsubscribe(sub_arn):
+    try:
+        sns_client.unsubscribe(SubscriptionArn=sub_arn)
+        print(f"Unsubscribed {sub_arn}")
+    except ClientError as e:
+        if e.response['Error']['Code'] not in NOT_FOUND_CODES:
+            raise
+
+def delete_topic(arn):
+    print(f"Deleting SNS topic: {arn}")
+    # Unsubscribe all confirmed subscriptions
+    subs = paginate(sns_client, 'list_subscriptions_by_topic', 'Subscriptions', TopicArn=arn)
+    sub_arns = [sub.get('SubscriptionArn') for sub in subs]
+    run_parallel(unsubscribe, [s for s in sub_arns if s and s != 'PendingConfirmation'])
+    # Delete topic
+    try:
+        sns_client.delete_topic(TopicArn=arn)
+        print(f"Deleted SNS topic {arn}")
+    except ClientError as e:
+        if e.response['Error']['Code'] not in NOT_FOUND_CODES:
+            raise
+
+def delete_rule(rule_name):
+    print(f"Deleting EventBridge rule: {rule_name}")
+    target_ids = [t['Id'] for t in paginate(events_client, 'list_targets_by_rule', 'Targets', Rule=rule_name)]
+    if target_ids:
+        events_client.remove_targets(Rule=rule_name, Ids=target_ids)
+    events_client.delete_rule(Name=rule_name)
+
+def table_created_at(table_name):
+    return dynamodb_client.describe_table(TableName=table_name)['Table']['CreationDateTime']
+
+def delete_table(table_name):
+    print(f"Deleting DynamoDB table: {table_name}")
+    dynamodb_client.delete_table(TableName=table_name)
+
+def wait_table_deleted(table_name):
+    waiter = dynamodb_client.get_waiter('table_not_exists')
+    waiter.wait(TableName=table_name, WaiterConfig={'Delay': 5, 'MaxAttempts': 60})
 
 # -----------------------------
-# 1. Delete Lambda functions created in last 24h
+# 1. Delete Lambda functions created since cutoff
 # -----------------------------
-print("Checking Lambda functions...")
-for fn in lambda_client.list_functions()['Functions']:
-    created = fn['LastModified']
-    fn_name = fn['FunctionName']
-    created_dt = datetime.strptime(created, "%Y-%m-%dT%H:%M:%S.%f%z")
-    if created_dt >= cutoff and BASE_NAME in fn_name:
-        print(f"Deleting Lambda: {fn_name}")
-        lambda_client.delete_function(FunctionName=fn_name)
+def delete_functions(base_name, cutoff, timestamp=None):
+    print("Checking Lambda functions...")
+    # Lambda's LastModified is ISO-8601 in UTC ("...T02:10:23.345+0000"), which
+    # sorts lexicographically, so it can be compared as a string without parsing
+    lambda_cutoff = cutoff.strftime("%Y-%m-%dT%H:%M:%S")
+    # Filters are generators fed straight to the pool, so deletes start before the last page arrives
+    functions = search(lambda_client, 'list_functions', f"Functions[?contains(FunctionName, '{base_name}')]")
+    lambda_names = (fn['FunctionName'] for fn in functions
+                    if in_scope(fn['FunctionName'], fn['LastModified'], lambda_cutoff, timestamp))
+    run_parallel(delete_lambda, lambda_names)
 
 # -----------------------------
-# 2. Delete IAM roles created in last 24h
+# 2. Delete IAM roles created since cutoff
 # -----------------------------
-print("Checking IAM roles...")
-for role in iam_client.list_roles()['Roles']:
-    role_name = role['RoleName']
-    created = role['CreateDate']
-    if created >= cutoff and BASE_NAME in role_name:
-        print(f"Deleting IAM role: {role_name}")
-        # Delete inline policies
-        for pol in iam_client.list_role_policies(RoleName=role_name)['PolicyNames']:
-            iam_client.delete_role_policy(RoleName=role_name, PolicyName=pol)
-        # Detach managed policies
-        for pol in iam_client.list_attached_role_policies(RoleName=role_name)['AttachedPolicies']:
-            iam_client.detach_role_policy(RoleName=role_name, PolicyArn=pol['PolicyArn'])
-        # Delete role
-        iam_client.delete_role(RoleName=role_name)
+def delete_roles(base_name, cutoff, timestamp=None):
+    print("Checking IAM roles...")
+    roles = search(iam_client, 'list_roles', f"Roles[?contains(RoleName, '{base_name}')]",
+                   PaginationConfig={'PageSize': 1000})
+    role_names = (role['RoleName'] for role in roles
+                  if in_scope(role['RoleName'], role['CreateDate'], cutoff, timestamp))
+    run_parallel(delete_role, role_names)
 
 # -----------------------------
-# 3. Delete S3 buckets created in last 24h
+# 3. Delete S3 buckets created since cutoff
 # -----------------------------
-print("Checking S3 buckets...")
-for bucket in s3_client.list_buckets()['Buckets']:
-    bucket_name = bucket['Name']
-    created = bucket['CreationDate']
-    if created >= cutoff and BASE_NAME in bucket_name:
-        print(f"Deleting S3 bucket: {bucket_name}")
-        # Delete objects (including versioned)
-        try:
-            paginator = s3_client.get_paginator('list_object_versions')
-            for page in paginator.paginate(Bucket=bucket_name):
-                versions = page.get('Versions', []) + page.get('DeleteMarkers', [])
-                for v in versions:
-                    s3_client.delete_object(Bucket=bucket_name, Key=v['Key'], VersionId=v['VersionId'])
-        except s3_client.exceptions.NoSuchBucket:
-            pass
-        # Delete bucket
-        s3_client.delete_bucket(Bucket=bucket_name)
+def delete_buckets(base_name, cutoff, timestamp=None):
+    print("Checking S3 buckets...")
+    bucket_names = (bucket['Name'] for bucket in paginate(s3_client, 'list_buckets', 'Buckets')
+                    if base_name in bucket['Name'] and in_scope(bucket['Name'], bucket['CreationDate'], cutoff, timestamp))
+    run_parallel(delete_bucket, bucket_names)
 
 # -----------------------------
-# 4. Delete SNS topics created in last 24h
+# 4. Delete SNS topics created since cutoff
 # -----------------------------
-print("Checking SNS topics...")
-for topic in sns_client.list_topics()['Topics']:
-    arn = topic['TopicArn']
-    if BASE_NAME in arn:
-        print(f"Deleting SNS topic: {arn}")
-        # Unsubscribe all confirmed subscriptions
-        subs = sns_client.list_subscriptions_by_topic(TopicArn=arn)['Subscriptions']
-        for sub in subs:
-            sub_arn = sub.get('SubscriptionArn')
-            if sub_arn and sub_arn != 'PendingConfirmation':
-                try:
-                    sns_client.unsubscribe(SubscriptionArn=sub_arn)
-                    print(f"Unsubscribed {sub_arn}")
-                except Exception as e:
-                    print(f"Failed to unsubscribe {sub_arn}: {e}")
-        # Delete topic
-        try:
-            sns_client.delete_topic(TopicArn=arn)
-            print(f"Deleted SNS topic {arn}")
-        except Exception as e:
-            print(f"Failed to delete topic {arn}: {e}")
+def delete_topics(base_name, cutoff, timestamp=None):
+    print("Checking SNS topics...")
+    # SNS reports no creation time, so it is read from the topic name
+    topic_arns = search(sns_client, 'list_topics', f"Topics[?contains(TopicArn, '{base_name}')].TopicArn")
+    topic_arns = (arn for arn in topic_arns if in_scope(arn, name_created_at(arn), cutoff, timestamp))
+    run_parallel(delete_topic, topic_arns)
 
 # -----------------------------
-# 5. Delete DynamoDB tables created in last 24h
+# 5. Delete DynamoDB tables created since cutoff
 # -----------------------------
-print("Checking DynamoDB tables...")
-for table_name in dynamodb_client.list_tables()['TableNames']:
-    if BASE_NAME in table_name:
-        desc = dynamodb_client.describe_table(TableName=table_name)['Table']
-        created = desc['CreationDateTime']
-        if created >= cutoff:
-            print(f"Deleting DynamoDB table: {table_name}")
-            dynamodb_client.delete_table(TableName=table_name)
-            waiter = dynamodb_client.get_waiter('table_not_exists')
-            waiter.wait(TableName=table_name)
-
-print("\nCLEANUP COMPLETE: All resources created in last 24 hours have been removed.")
+def delete_tables(base_name, cutoff, timestamp=None):
+    print("Checking DynamoDB tables...")
+    candidates = list(search(dynamodb_client, 'list_tables', f"TableNames[?contains(@, '{base_name}')]"))
+    if timestamp is not None:
+        table_names = [name for name in candidates if in_scope(name, None, None, timestamp)]
+    else:
+        # Only name-matched tables are described, and those describes run concurrently
+        created_times = run_parallel(table_created_at, candidates)
+        table_names = [name for name, created in zip(candidates, created_times) if created and created >= cutoff]
+    # Issue every delete first, then wait on all of them at once
+    run_parallel(delete_table, table_names)
+    run_parallel(wait_table_deleted, table_names)
+
+# -----------------------------
+# 6. Delete EventBridge warmer rules created since cutoff
+# -----------------------------
+def delete_rules(base_name, cutoff, timestamp=None):
+    print("Checking EventBridge rules...")
+    # Rules report no creation time either; warmer rules are named <function>-warmer
+    rule_names = search(events_client, 'list_rules', f"Rules[?contains(Name, '{base_name}')].Name")
+    rule_names = (name for name in rule_names if in_scope(name, name_created_at(name), cutoff, timestamp))
+    run_parallel(delete_rule, rule_names)
+
+def resource_name(value):
+    """argparse type for --base-name: it is pasted into JMESPath string literals, so only name characters are allowed."""
+    if not re.fullmatch(r"[A-Za-z0-9._-]+", value):
+        raise argparse.ArgumentTypeError(f"{value!r} may only contain letters, digits, '.', '_' and '-'")
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete word-analysis resources created within a time window.")
+    parser.add_argument("--base-name", type=resource_name, default=BASE_NAME, help=f"substring resource names must contain (default: {BASE_NAME})")
+    parser.add_argument("--ttl-hours", type=float, default=TTL_HOURS, help=f"only delete resources newer than this (default: {TTL_HOURS})")
+    parser.add_argument("--timestamp", type=int,
+                        help="delete only the deployment whose names end in -<timestamp>, whatever its age (overrides --ttl-hours)")
+    args = parser.parse_args()
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=args.ttl_hours)
+    delete_functions(args.base_name, cutoff, args.timestamp)
+    delete_roles(args.base_name, cutoff, args.timestamp)
+    delete_buckets(args.base_name, cutoff, args.timestamp)
+    delete_topics(args.base_name, cutoff, args.timestamp)
+    delete_tables(args.base_name, cutoff, args.timestamp)
+    delete_rules(args.base_name, cutoff, args.timestamp)
+
+    if args.timestamp is not None:
+        print(f"\nCLEANUP COMPLETE: All resources of deployment {args.timestamp} have been removed.")
+    else:
+        print(f"\nCLEANUP COMPLETE: All resources created in last {args.ttl_hours:g} hours have been removed.")
+
+if __name__ == "__main__":
+    main()
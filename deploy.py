@@ -1,30 +1,299 @@
-import boto3, os, time, shutil, subprocess, sys, json
+import boto3, os, time, shutil, subprocess, sys, json, hashlib, io, zipfile, argparse, compileall, py_compile, base64, tempfile, platform
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 def log_step(message):
     """Print message with timestamp."""
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
 
+def retry_with_backoff(func, should_retry, max_attempts=10):
+    """Call func until it succeeds, sleeping 0.5s, 1s, 2s ... (capped at 8s) between retryable failures."""
+    for attempt in range(max_attempts):
+        try:
+            return func()
+        except ClientError as e:
+            if attempt == max_attempts - 1 or not should_retry(e):
+                raise
+            time.sleep(min(8, 0.5 * 2 ** attempt))
+
 REGION = "us-east-1"
 BASE_NAME = "file-word-analysis"
 LAMBDA_CODE_FILENAME = "lambda_word_analysis.py"
+LAMBDA_SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lambda_function", LAMBDA_CODE_FILENAME)
 DYNAMO_TABLE_NAME = f"{BASE_NAME}-table"
+# PDF extraction and tokenizing are CPU bound and Lambda allocates vCPU in
+# proportion to memory, so the default 128 MB (~1/12 vCPU) is far too small
+LAMBDA_MEMORY_MB = 3008
+# PDFs in one batch take turns in PDFium, so leave room beyond a single file
+LAMBDA_TIMEOUT_S = 60
+# Only uploads with these extensions invoke the Lambda. S3 suffix filters are
+# case-sensitive, so both cases are registered.
+SUPPORTED_SUFFIXES = (".txt", ".csv", ".pdf")
+
+# Third-party packages bundled with the Lambda, and where built copies are cached between deploys
+LAMBDA_REQUIREMENTS = ["pypdfium2"]
+DEPS_CACHE_ROOT = os.path.expanduser("~/.cache/lambda-deps")
+# Dependencies ship as a layer that is republished only when its requirements change
+LAYER_NAME = f"{BASE_NAME}-deps"
+# Scratch space for the function package; tmpfs keeps staging off the disk
+PACKAGE_STAGING_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
+# Compact JSON for documents sent to AWS APIs
+JSON_SEPARATORS = (",", ":")
+TRUST_POLICY_DOCUMENT = json.dumps({
+    "Version": "2012-10-17",
+    "Statement": [{"Effect": "Allow", "Principal": {"Service": "lambda.amazonaws.com"}, "Action": "sts:AssumeRole"}]
+}, separators=JSON_SEPARATORS)
+
+# Files that deflate would only waste CPU on
+PRECOMPRESSED_SUFFIXES = (".zip", ".whl", ".gz", ".bz2", ".xz", ".png", ".jpg", ".jpeg")
+
+# Earliest timestamp a zip entry can hold; used for every entry so builds are reproducible
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# Zips above this go through S3 with parallel multipart upload instead of inline in the API call
+INLINE_ZIP_LIMIT = 6 * 1024 * 1024
+ZIP_TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024,
+                                     multipart_chunksize=8 * 1024 * 1024, max_concurrency=10)
+# Graviton (arm64) is billed ~20% less per GB-second than x86_64 and
+# pypdfium2 ships aarch64 wheels, so functions and layers target it
+LAMBDA_ARCHITECTURE = "arm64"
+# Machine name of that architecture, as used by wheel tags and binutils
+LAMBDA_MACHINE = {"arm64": "aarch64", "x86_64": "x86_64"}[LAMBDA_ARCHITECTURE]
+# Bytecode is only precompiled when the local interpreter matches the runtime
+LAMBDA_RUNTIME = "python3.11"
+LAMBDA_PYTHON_VERSION = (3, 11)
+# Target the Lambda runtime so wheels are never built for the local machine.
+# --no-deps means LAMBDA_REQUIREMENTS must list every package needed at runtime;
+# --no-compile keeps the layer source-only; only the handler is precompiled.
+PIP_PLATFORM_ARGS = ["--only-binary=:all:", "--platform", f"manylinux2014_{LAMBDA_MACHINE}",
+                     "--implementation", "cp", "--python-version", "3.11",
+                     "--no-deps", "--no-compile"]
+# Downloaded wheels are kept here so a cache miss above still skips the network
+PIP_CACHE_DIR = os.path.expanduser("~/.cache/lambda-deps/pip")
+
+# AWS clients: keep-alive connections, adaptive retries, and a pool large
+# enough for the thread pool plus S3 multipart uploads
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 10},
+    max_pool_connections=50,
+)
+# One session resolves credentials and loads service data once for every client
+session = boto3.Session()
+s3_client = session.client("s3", region_name=REGION, config=CLIENT_CONFIG)
+iam_client = session.client("iam", config=CLIENT_CONFIG)
+sns_client = session.client("sns", config=CLIENT_CONFIG)
+lambda_client = session.client("lambda", region_name=REGION, config=CLIENT_CONFIG)
+dynamodb_client = session.client("dynamodb", region_name=REGION, config=CLIENT_CONFIG)
+sts_client = session.client("sts", config=CLIENT_CONFIG)
+events_client = session.client("events", region_name=REGION, config=CLIENT_CONFIG)
+
+ACCOUNT_CACHE_DIR = os.path.expanduser("~/.cache/lambda-deps/accounts")
+
+def cached_account_id():
+    """Return the caller's account id, calling STS only the first time these credentials are seen."""
+    credentials = session.get_credentials()
+    if credentials is None:
+        return sts_client.get_caller_identity()["Account"]
+    # An access key always belongs to one account, so it is a safe cache key
+    cache_path = os.path.join(ACCOUNT_CACHE_DIR, hashlib.sha256(credentials.access_key.encode()).hexdigest())
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return f.read().strip()
+    account_id = sts_client.get_caller_identity()["Account"]
+    os.makedirs(ACCOUNT_CACHE_DIR, exist_ok=True)
+    with open(cache_path, "w") as f:
+        f.write(account_id)
+    return account_id
+
+parser = argparse.ArgumentParser(description="Deploy the word-analysis serverless app.")
+parser.add_argument("--provisioned", type=int, default=0, metavar="N",
+                    help="keep N pre-initialized Lambda environments warm via provisioned concurrency (default: off)")
+parser.add_argument("--memory", type=int, default=LAMBDA_MEMORY_MB, metavar="MB",
+                    help=f"Lambda memory size; CPU share scales with it (default: {LAMBDA_MEMORY_MB})")
+parser.add_argument("--warmer", action="store_true",
+                    help="create an EventBridge rule that pings the Lambda every 5 minutes to keep it warm")
+parser.add_argument("--emails", default=os.environ.get("SNS_SUBSCRIBE_EMAILS", ""), metavar="ADDR[,ADDR...]",
+                    help="comma-separated SNS subscriber emails (default: $SNS_SUBSCRIBE_EMAILS, else prompt)")
+parser.add_argument("--update", metavar="FUNCTION",
+                    help="only push the current handler code to an existing function, skipping the upload if it is unchanged")
+args = parser.parse_args()
+
+# Independent control-plane calls are I/O bound, so they share a thread pool.
+# The account id is only needed for ARNs, so fetch it in the background; this
+# starts after argument parsing so --help and usage errors never touch AWS.
+executor = ThreadPoolExecutor(max_workers=16)
+account_id_future = executor.submit(cached_account_id)
+
+
+def requirements_key(requirements):
+    """Hash identifying one build of requirements for the Lambda platform."""
+    return hashlib.sha256("\n".join(sorted(requirements) + PIP_PLATFORM_ARGS).encode()).hexdigest()
+
+def strip_tool():
+    """Return a strip binary that understands Lambda's machine code, or None if there is none."""
+    # The host strip only handles host objects; on anything else it can corrupt the .so files
+    if sys.platform == "linux" and platform.machine() == LAMBDA_MACHINE:
+        return shutil.which("strip")
+    return shutil.which(f"{LAMBDA_MACHINE}-linux-gnu-strip")
+
+def slim_packages(directory):
+    """Drop files the Lambda runtime never uses and strip debug symbols from shared libraries."""
+    # Console scripts are never run inside Lambda
+    shutil.rmtree(os.path.join(directory, "bin"), ignore_errors=True)
+    strip = strip_tool()
+    if not strip:
+        log_step("No strip tool for the Lambda architecture; shared libraries left unstripped")
+    for root, dirs, files in os.walk(directory):
+        for d in [d for d in dirs if d in ("tests", "__pycache__")]:
+            shutil.rmtree(os.path.join(root, d))
+            dirs.remove(d)
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(".pyi"):
+                os.remove(path)
+            elif strip and (name.endswith(".so") or ".so." in name):
+                result = subprocess.run([strip, "--strip-unneeded", path], capture_output=True, text=True)
+                if result.returncode != 0:
+                    log_step(f"Could not strip {path}: {result.stderr.strip()}")
+
+def cached_dependencies(requirements):
+    """Return a directory holding requirements installed for Lambda, running pip only on a cache miss."""
+    key = requirements_key(requirements)
+    cache_dir = os.path.join(DEPS_CACHE_ROOT, key)
+    if os.path.isdir(cache_dir):
+        log_step(f"Using cached dependencies: {cache_dir}")
+    else:
+        # Install into a scratch dir and rename, so an interrupted pip never leaves a half-built cache entry
+        tmp_dir = f"{cache_dir}.tmp"
+        os.makedirs(DEPS_CACHE_ROOT, exist_ok=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *requirements, *PIP_PLATFORM_ARGS,
+                               "--cache-dir", PIP_CACHE_DIR, "-t", tmp_dir])
+        slim_packages(tmp_dir)
+        os.rename(tmp_dir, cache_dir)
+    return cache_dir
+
+def zip_directory(directory, prefix=""):
+    """Return the zip archive of directory's contents (under prefix) as bytes, built in memory.
+
+    Wheel RECORD files are left out (the runtime never reads them), and
+    already-compressed files are stored rather than deflated. Entries are
+    sorted and carry a fixed timestamp and mode, so unchanged inputs give
+    identical bytes and Lambda's CodeSha256 can be used to detect no-op updates.
+    """
+    # compresslevel=1 is several times faster than the default and the upload
+    # size barely changes for already-compressed wheels
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name == "RECORD" and root.endswith(".dist-info"):
+                    continue
+                path = os.path.join(root, name)
+                info = zipfile.ZipInfo.from_file(path, arcname=os.path.join(prefix, os.path.relpath(path, directory)))
+                info.date_time = ZIP_DATE_TIME
+                # Regular file, rw-r--r--, whatever the checkout's umask left on disk
+                info.external_attr = 0o100644 << 16
+                info.compress_type = zipfile.ZIP_STORED if name.endswith(PRECOMPRESSED_SUFFIXES) else zipfile.ZIP_DEFLATED
+                with open(path, "rb") as f:
+                    zf.writestr(info, f.read(), compresslevel=1)
+    return zip_buffer.getvalue()
+
+def compile_bytecode(directory):
+    """Precompile directory's sources so cold starts skip compilation; only possible with a matching local Python."""
+    if sys.version_info[:2] != LAMBDA_PYTHON_VERSION:
+        log_step(f"Local Python is not {'.'.join(map(str, LAMBDA_PYTHON_VERSION))}; shipping source only")
+        return
+    # /var/task is read-only, so without these the runtime recompiles on every
+    # cold start. Unchecked hashes stay valid whatever mtimes the zip restores,
+    # and ddir records the deployed path instead of the random staging dir.
+    compileall.compile_dir(directory, quiet=1, ddir="/var/task",
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+
+def package_function():
+    """Copy the handler into a scratch package, precompile it, and return the package zip as bytes."""
+    # Staged in RAM (tmpfs) when available; the directory removes itself
+    with tempfile.TemporaryDirectory(dir=PACKAGE_STAGING_ROOT) as package_dir:
+        shutil.copy(LAMBDA_SOURCE_PATH, package_dir)
+        compile_bytecode(package_dir)
+        return zip_directory(package_dir)
+
+def code_location(zip_bytes, key):
+    """Return a Lambda Code/Content dict for zip_bytes: inline when small, otherwise staged in S3."""
+    if len(zip_bytes) <= INLINE_ZIP_LIMIT:
+        return {"ZipFile": zip_bytes}
+    # A dedicated bucket, since uploads to the source bucket would trigger the Lambda
+    artifact_bucket = f"{BASE_NAME}-artifacts-{account_id_future.result()}-{REGION}"
+    try:
+        s3_client.head_bucket(Bucket=artifact_bucket)
+    except ClientError:
+        if REGION == "us-east-1":
+            s3_client.create_bucket(Bucket=artifact_bucket)
+        else:
+            s3_client.create_bucket(Bucket=artifact_bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
+    log_step(f"Uploading {len(zip_bytes) // 1024} KB package to s3://{artifact_bucket}/{key}")
+    s3_client.upload_fileobj(io.BytesIO(zip_bytes), artifact_bucket, key, Config=ZIP_TRANSFER_CONFIG)
+    return {"S3Bucket": artifact_bucket, "S3Key": key}
+
+def publish_or_reuse_layer(name, requirements):
+    """Return the ARN of a layer version holding requirements, publishing one only if none matches."""
+    key = requirements_key(requirements)
+    for page in lambda_client.get_paginator("list_layer_versions").paginate(LayerName=name):
+        for version in page["LayerVersions"]:
+            if version.get("Description") == key:
+                log_step(f"Reusing Lambda layer: {version['LayerVersionArn']}")
+                return version["LayerVersionArn"]
+    # Layers are mounted at /opt and python/ is on the runtime's sys.path; the
+    # cached install is zipped in place rather than copied into a staging tree
+    layer_zip = zip_directory(cached_dependencies(requirements), prefix="python")
+    response = lambda_client.publish_layer_version(
+        LayerName=name,
+        Description=key,
+        Content=code_location(layer_zip, f"layers/{name}-{key}.zip"),
+        CompatibleRuntimes=[LAMBDA_RUNTIME],
+        CompatibleArchitectures=[LAMBDA_ARCHITECTURE],
+    )
+    log_step(f"Published Lambda layer: {response['LayerVersionArn']}")
+    return response["LayerVersionArn"]
 
-# AWS clients
-s3_client = boto3.client("s3", region_name=REGION)
-iam_client = boto3.client("iam")
-sns_client = boto3.client("sns")
-lambda_client = boto3.client("lambda", region_name=REGION)
-dynamodb_client = boto3.client("dynamodb", region_name=REGION)
-sts_client = boto3.client("sts")
-
-ACCOUNT_ID = sts_client.get_caller_identity()["Account"]
+# -----------------------------
+# Code-only redeploy of an existing function
+# -----------------------------
+if args.update:
+    log_step(f"Updating code of {args.update}...")
+    # Provisioned stacks route S3 and the warmer to a published version, which
+    # would keep running the old code while only $LATEST changed
+    if lambda_client.list_provisioned_concurrency_configs(FunctionName=args.update)["ProvisionedConcurrencyConfigs"]:
+        log_step(f"{args.update} serves a published version with provisioned concurrency; "
+                 "--update only changes $LATEST. Redeploy instead.")
+        executor.shutdown()
+        sys.exit(1)
+    zip_bytes = package_function()
+    # Lambda reports CodeSha256 as the base64 SHA-256 of the deployed zip
+    code_sha = base64.b64encode(hashlib.sha256(zip_bytes).digest()).decode()
+    if lambda_client.get_function_configuration(FunctionName=args.update)["CodeSha256"] == code_sha:
+        log_step("Code unchanged; nothing to update.")
+    else:
+        lambda_client.update_function_code(FunctionName=args.update,
+                                           **code_location(zip_bytes, f"functions/{args.update}.zip"))
+        lambda_client.get_waiter("function_updated_v2").wait(
+            FunctionName=args.update, WaiterConfig={"Delay": 1, "MaxAttempts": 60})
+        log_step("Lambda code updated.")
+    executor.shutdown()
+    sys.exit(0)
 
 # -----------------------------
-# 1. Prompt for SNS subscribers
+# 1. Collect SNS subscribers
 # -----------------------------
 log_step("Starting deployment process...")
-emails_input = input("Enter comma-separated email addresses for notifications: ").strip()
+emails_input = args.emails
+# Only prompt when someone is there to answer, so scripted deploys never block
+if not emails_input.strip() and sys.stdin.isatty():
+    emails_input = input("Enter comma-separated email addresses for notifications: ")
 emails = [email.strip() for email in emails_input.split(",") if email.strip()]
 if not emails:
     log_step("No valid emails provided. Exiting.")
@@ -45,213 +314,193 @@ log_step(f"Lambda function: {lambda_name}")
 log_step(f"IAM role: {lambda_role_name}")
 
 # -----------------------------
-# 3. Create S3 bucket
+# 3. Create S3 bucket and dependency layer (in the background)
 # -----------------------------
+def create_source_bucket():
+    try:
+        if REGION == "us-east-1":
+            s3_client.create_bucket(Bucket=source_bucket)
+        else:
+            s3_client.create_bucket(Bucket=source_bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
+        log_step(f"Created bucket: {source_bucket}")
+    except Exception as e:
+        log_step(f"Bucket {source_bucket} creation skipped or failed: {e}")
+
 log_step("Creating S3 bucket...")
-try:
-    if REGION == "us-east-1":
-        s3_client.create_bucket(Bucket=source_bucket)
-    else:
-        s3_client.create_bucket(Bucket=source_bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
-    log_step(f"Created bucket: {source_bucket}")
-except Exception as e:
-    log_step(f"Bucket {source_bucket} creation skipped or failed: {e}")
+bucket_future = executor.submit(create_source_bucket)
+# The dependency layer only needs the Lambda API, so pip/zip/upload overlap
+# with the rest of the setup
+log_step("Preparing dependency layer...")
+layer_future = executor.submit(publish_or_reuse_layer, LAYER_NAME, LAMBDA_REQUIREMENTS)
 
 # -----------------------------
 # 4. Create SNS topic and subscribe emails
 # -----------------------------
 log_step("Creating SNS topic and subscribing emails...")
 sns_topic_arn = sns_client.create_topic(Name=sns_topic_name)["TopicArn"]
-for email in emails:
-    sns_client.subscribe(TopicArn=sns_topic_arn, Protocol="email", Endpoint=email)
+subscribe_futures = {
+    email: executor.submit(sns_client.subscribe, TopicArn=sns_topic_arn, Protocol="email", Endpoint=email)
+    for email in emails
+}
+# One bad address should not abort the deployment
+for email, future in subscribe_futures.items():
+    if future.exception():
+        log_step(f"Subscription for {email} failed: {future.exception()}")
 log_step("SNS topic created and subscriptions sent.")
 
 # -----------------------------
-# 5. Create DynamoDB table
-# -----------------------------
-log_step("Creating DynamoDB table...")
-try:
-    dynamodb_client.create_table(
-        TableName=DYNAMO_TABLE_NAME,
-        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
-        AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
-        BillingMode='PAY_PER_REQUEST'
-    )
-    log_step("DynamoDB table creating...")
-    waiter = dynamodb_client.get_waiter('table_exists')
-    waiter.wait(TableName=DYNAMO_TABLE_NAME)
-    log_step("DynamoDB table ready.")
-except dynamodb_client.exceptions.ResourceInUseException:
-    log_step("DynamoDB table already exists, skipping creation.")
-
+# 5. Create DynamoDB table (in the background)
 # -----------------------------
-# 6. Create IAM role for Lambda
-# -----------------------------
-log_step("Creating IAM role and attaching policies for Lambda...")
-trust_policy = {
-    "Version": "2012-10-17",
-    "Statement": [{"Effect": "Allow", "Principal": {"Service": "lambda.amazonaws.com"}, "Action": "sts:AssumeRole"}]
-}
-role = iam_client.create_role(RoleName=lambda_role_name, AssumeRolePolicyDocument=json.dumps(trust_policy))
-time.sleep(10)
-iam_client.attach_role_policy(RoleName=lambda_role_name, PolicyArn="arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole")
+def create_table():
+    try:
+        dynamodb_client.create_table(
+            TableName=DYNAMO_TABLE_NAME,
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        log_step("DynamoDB table creating...")
+        waiter = dynamodb_client.get_waiter('table_exists')
+        # The default 20s poll interval overshoots a PAY_PER_REQUEST table that is usually active in seconds
+        waiter.wait(TableName=DYNAMO_TABLE_NAME, WaiterConfig={'Delay': 2, 'MaxAttempts': 30})
+        log_step("DynamoDB table ready.")
+    except dynamodb_client.exceptions.ResourceInUseException:
+        log_step("DynamoDB table already exists, skipping creation.")
 
-inline_policy = {
-    "Version": "2012-10-17",
-    "Statement": [
-        {"Effect": "Allow",
-         "Action": ["s3:GetObject"],
-         "Resource":[f"arn:aws:s3:::{source_bucket}/*"]},
-        {"Effect": "Allow",
-         "Action":["sns:Publish"],
-         "Resource":[sns_topic_arn]},
-        {"Effect": "Allow",
-         "Action":["dynamodb:PutItem"],
-         "Resource":[f"arn:aws:dynamodb:{REGION}:{ACCOUNT_ID}:table/{DYNAMO_TABLE_NAME}"]}
-    ]
-}
-iam_client.put_role_policy(RoleName=lambda_role_name, PolicyName=f"{BASE_NAME}-policy", PolicyDocument=json.dumps(inline_policy))
-log_step("IAM role and policies created for Lambda.")
+log_step("Creating DynamoDB table...")
+table_future = executor.submit(create_table)
 
 # -----------------------------
-# 7. Write Lambda code
+# 6. Create IAM role for Lambda (in the background)
 # -----------------------------
-log_step("Writing Lambda code...")
-lambda_code = f"""
-import boto3, csv, re
-from io import StringIO, BytesIO
-from collections import Counter
-from PyPDF2 import PdfReader
-import os
-
-SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
-DYNAMO_TABLE = os.environ['DYNAMO_TABLE']
-
-s3 = boto3.client('s3')
-sns = boto3.client('sns')
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(DYNAMO_TABLE)
-
-def analyze_text(text):
-    words = re.findall(r'\\b\\w+\\b', text.lower())
-    total_words = len(words)
-    unique_words = len(set(words))
-    top_words = Counter(words).most_common(5)
-    lines = text.splitlines()
-    return {{
-        'total_words': total_words,
-        'unique_words': unique_words,
-        'top_words': top_words,
-        'total_lines': len(lines)
-    }}
-
-def lambda_handler(event, context):
-    summary = []
-
-    for record in event.get("Records", []):
-        src_bucket = record['s3']['bucket']['name']
-        key = record['s3']['object']['key']
-
-        try:
-            obj = s3.get_object(Bucket=src_bucket, Key=key)
-            content_bytes = obj['Body'].read()
-            file_lower = key.lower()
-            analysis_results = []
-
-            if file_lower.endswith(".csv"):
-                content_str = content_bytes.decode('utf-8')
-                sniffer = csv.Sniffer()
-                dialect = sniffer.sniff(content_str[:1024])
-                reader = csv.DictReader(StringIO(content_str), delimiter=dialect.delimiter)
-                for i, row in enumerate(reader):
-                    row_text = ' '.join(row.values())
-                    analysis = analyze_text(row_text)
-                    analysis['row_number'] = i + 1
-                    table.put_item(Item={{'id': f"{{key}}_row{{i+1}}", **analysis}})
-                    analysis_results.append(f"Row {{i+1}}: {{analysis}}")
-            elif file_lower.endswith(".txt"):
-                content_str = content_bytes.decode('utf-8')
-                analysis = analyze_text(content_str)
-                table.put_item(Item={{'id': key, **analysis}})
-                analysis_results.append(str(analysis))
-            elif file_lower.endswith(".pdf"):
-                reader = PdfReader(BytesIO(content_bytes))
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\\n"
-                analysis = analyze_text(text)
-                table.put_item(Item={{'id': key, **analysis}})
-                analysis_results.append(str(analysis))
-            else:
-                analysis_results.append("Skipped unsupported file type.")
-
-            summary.append(f"File: {{key}}\\n" + "\\n".join(analysis_results))
-
-        except Exception as e:
-            summary.append(f"File: {{key}} - Failed: {{e}}")
-
-    if summary:
-        message = "\\n\\n".join(summary)
-        sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=f"File Analysis Summary ({{len(event.get('Records', []))}} file(s))",
-            Message=message
-        )
+def create_lambda_role():
+    iam_client.create_role(RoleName=lambda_role_name, AssumeRolePolicyDocument=TRUST_POLICY_DOCUMENT)
+    # IAM is eventually consistent; make sure the role is visible before attaching policy to it
+    iam_client.get_waiter("role_exists").wait(RoleName=lambda_role_name, WaiterConfig={"Delay": 1, "MaxAttempts": 20})
+    account_id = account_id_future.result()
+    inline_policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {"Effect": "Allow",
+             "Action": ["s3:GetObject"],
+             "Resource":[f"arn:aws:s3:::{source_bucket}/*"]},
+            {"Effect": "Allow",
+             "Action":["sns:Publish"],
+             "Resource":[sns_topic_arn]},
+            {"Effect": "Allow",
+             "Action":["dynamodb:PutItem", "dynamodb:BatchWriteItem"],
+             "Resource":[f"arn:aws:dynamodb:{REGION}:{account_id}:table/{DYNAMO_TABLE_NAME}"]},
+            # What AWSLambdaBasicExecutionRole grants, scoped to this function,
+            # so a single IAM write sets up the role
+            {"Effect": "Allow",
+             "Action":["logs:CreateLogGroup"],
+             "Resource":[f"arn:aws:logs:{REGION}:{account_id}:*"]},
+            {"Effect": "Allow",
+             "Action":["logs:CreateLogStream", "logs:PutLogEvents"],
+             "Resource":[f"arn:aws:logs:{REGION}:{account_id}:log-group:/aws/lambda/{lambda_name}:*"]}
+        ]
+    }
+    iam_client.put_role_policy(RoleName=lambda_role_name, PolicyName=f"{BASE_NAME}-policy",
+                               PolicyDocument=json.dumps(inline_policy, separators=JSON_SEPARATORS))
+    log_step("IAM role and policies created for Lambda.")
 
-    return {{'statusCode': 200, 'body': 'Processing complete and summary sent.'}}
-"""
-
-with open(LAMBDA_CODE_FILENAME, "w") as f:
-    f.write(lambda_code)
-log_step("Lambda code file written successfully.")
+log_step("Creating IAM role and attaching policies for Lambda...")
+role_future = executor.submit(create_lambda_role)
 
 # -----------------------------
-# 8. Package Lambda
+# 7. Package Lambda
 # -----------------------------
 log_step("Packaging Lambda function...")
-package_dir = "lambda_package"
-if os.path.exists(package_dir): shutil.rmtree(package_dir)
-os.makedirs(package_dir)
-shutil.copy(LAMBDA_CODE_FILENAME, package_dir)
-
-# Install PyPDF2 locally in package_dir
-subprocess.check_call([sys.executable, "-m", "pip", "install", "PyPDF2", "-t", package_dir])
+function_code = code_location(package_function(), f"functions/{lambda_name}.zip")
 
-zip_path = "lambda_package.zip"
-shutil.make_archive("lambda_package", 'zip', package_dir)
+# pypdfium2 lives in a layer so code-only redeploys upload a few KB
+layer_arn = layer_future.result()
 log_step("Lambda package created.")
 
 # -----------------------------
-# 9. Deploy Lambda
+# 8. Deploy Lambda
 # -----------------------------
 log_step("Deploying Lambda function to AWS...")
-with open(zip_path, 'rb') as f:
-    zip_bytes = f.read()
 
-lambda_response = lambda_client.create_function(
+# A freshly created role takes a few seconds to become assumable; retrying
+# create_function is itself the readiness probe
+def role_not_ready(e):
+    return (e.response["Error"]["Code"] == "InvalidParameterValueException"
+            and "cannot be assumed" in e.response["Error"]["Message"])
+
+role_future.result()
+ACCOUNT_ID = account_id_future.result()
+lambda_response = retry_with_backoff(lambda: lambda_client.create_function(
     FunctionName=lambda_name,
-    Runtime="python3.11",
+    Runtime=LAMBDA_RUNTIME,
+    Architectures=[LAMBDA_ARCHITECTURE],
+    MemorySize=args.memory,
+    Timeout=LAMBDA_TIMEOUT_S,
     Role=f"arn:aws:iam::{ACCOUNT_ID}:role/{lambda_role_name}",
     Handler=f"{LAMBDA_CODE_FILENAME.rsplit('.',1)[0]}.lambda_handler",
-    Code={"ZipFile": zip_bytes},
+    Code=function_code,
+    Layers=[layer_arn],
     Environment={"Variables":{"SNS_TOPIC_ARN":sns_topic_arn,"DYNAMO_TABLE":DYNAMO_TABLE_NAME}}
-)
+), role_not_ready)
 lambda_arn = lambda_response["FunctionArn"]
 log_step(f"Lambda function deployed: {lambda_arn}")
 
+# Polls GetFunction until the function leaves Pending
+lambda_client.get_waiter("function_active_v2").wait(
+    FunctionName=lambda_name, WaiterConfig={"Delay": 1, "MaxAttempts": 60})
+
+# Provisioned concurrency only applies to a published version, so S3 must
+# invoke that version rather than $LATEST
+if args.provisioned:
+    log_step(f"Publishing version with {args.provisioned} provisioned environment(s)...")
+    version = lambda_client.publish_version(FunctionName=lambda_name)["Version"]
+    lambda_client.put_provisioned_concurrency_config(
+        FunctionName=lambda_name,
+        Qualifier=version,
+        ProvisionedConcurrentExecutions=args.provisioned
+    )
+    lambda_arn = f"{lambda_arn}:{version}"
+    log_step(f"Provisioned concurrency requested for version {version}.")
+
+# -----------------------------
+# 9. Optional EventBridge warmer (in the background)
+# -----------------------------
+def create_warmer():
+    rule_arn = events_client.put_rule(Name=f"{lambda_name}-warmer", ScheduleExpression="rate(5 minutes)")["RuleArn"]
+    # Runs alongside the S3 permission; concurrent policy edits conflict, so retry
+    retry_with_backoff(lambda: lambda_client.add_permission(
+        FunctionName=lambda_arn,
+        StatementId=f"events-warmer-{timestamp}",
+        Action="lambda:InvokeFunction",
+        Principal="events.amazonaws.com",
+        SourceArn=rule_arn
+    ), lambda e: e.response["Error"]["Code"] == "ResourceConflictException")
+    events_client.put_targets(
+        Rule=f"{lambda_name}-warmer",
+        Targets=[{"Id": "warmer", "Arn": lambda_arn, "Input": json.dumps({"warmer": True}, separators=JSON_SEPARATORS)}]
+    )
+    log_step(f"Warmer rule created: {rule_arn}")
+
+if args.warmer:
+    log_step("Creating EventBridge warmer rule...")
+    # The rule only needs the function ARN, so it is wired while S3 is set up
+    warmer_future = executor.submit(create_warmer)
+
 # -----------------------------
 # 10. Add S3 permission
 # -----------------------------
 log_step("Adding S3 permission for Lambda invocation...")
-time.sleep(15)
+bucket_future.result()
+table_future.result()
 try:
-    lambda_client.add_permission(
-        FunctionName=lambda_name,
+    # A function still finishing an update rejects policy changes with ResourceConflictException
+    retry_with_backoff(lambda: lambda_client.add_permission(
+        FunctionName=lambda_arn,
         StatementId=f"s3-invoke-{timestamp}",
         Action="lambda:InvokeFunction",
         Principal="s3.amazonaws.com",
         SourceArn=f"arn:aws:s3:::{source_bucket}"
-    )
+    ), lambda e: e.response["Error"]["Code"] == "ResourceConflictException")
     log_step("Permission added for S3 to invoke Lambda.")
 except Exception as e:
     log_step(f"Permission setup skipped or failed: {e}")
@@ -261,22 +510,26 @@ except Exception as e:
 # -----------------------------
 log_step("Configuring S3 trigger for Lambda...")
 notification_configuration = {
-    "LambdaFunctionConfigurations":[{"LambdaFunctionArn":lambda_arn,"Events":["s3:ObjectCreated:*"]}]
+    "LambdaFunctionConfigurations":[
+        {"LambdaFunctionArn":lambda_arn,"Events":["s3:ObjectCreated:*"],
+         "Filter":{"Key":{"FilterRules":[{"Name":"suffix","Value":suffix}]}}}
+        for ext in SUPPORTED_SUFFIXES for suffix in (ext, ext.upper())
+    ]
 }
-s3_client.put_bucket_notification_configuration(
+# S3 validates that it may invoke the function; until the new permission has
+# propagated it answers InvalidArgument ("Unable to validate destination")
+retry_with_backoff(lambda: s3_client.put_bucket_notification_configuration(
     Bucket=source_bucket,
     NotificationConfiguration=notification_configuration
-)
+), lambda e: e.response["Error"]["Code"] == "InvalidArgument")
 log_step("S3 trigger configured for Lambda.")
 
 # -----------------------------
-# 12. Cleanup local files
+# 12. Cleanup
 # -----------------------------
-log_step("Cleaning up local temporary files...")
-shutil.rmtree(package_dir)
-os.remove(zip_path)
-os.remove(LAMBDA_CODE_FILENAME)
-log_step("Local cleanup complete.")
+if args.warmer:
+    warmer_future.result()
+executor.shutdown()
 
 # -----------------------------
 # Final Summary
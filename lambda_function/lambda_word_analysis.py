@@ -0,0 +1,240 @@
+import boto3, codecs, csv, re, threading, time
+from botocore.config import Config
+from io import StringIO
+from itertools import chain
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
+DYNAMO_TABLE = os.environ['DYNAMO_TABLE']
+
+MAX_WORKERS = 8
+# Objects above the threshold are downloaded as parallel byte ranges; a
+# single GET stream tops out well below the function's network bandwidth
+RANGE_GET_THRESHOLD = 8 * 1024 * 1024
+RANGE_PART_SIZE = 8 * 1024 * 1024
+RANGE_GET_WORKERS = 4
+
+# Created during init so warm invocations reuse the clients and their
+# keep-alive connections; the pool covers every record worker
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    max_pool_connections=MAX_WORKERS * RANGE_GET_WORKERS
+)
+session = boto3.Session()
+s3 = session.client('s3', config=CLIENT_CONFIG)
+sns = session.client('sns', config=CLIENT_CONFIG)
+# The low-level client skips the resource layer's per-value type inference;
+# items are marshalled by to_item() for the fixed analysis schema
+dynamodb = session.client('dynamodb', config=CLIENT_CONFIG)
+
+# Compiled once per container and reused across warm invocations. A maximal
+# run of word characters is already bounded, so no \b anchors are needed.
+WORD_RE = re.compile(r'\w+')
+
+SUPPORTED_SUFFIXES = ('.txt', '.csv', '.pdf')
+
+# PDFium is not thread-safe, even across separate documents, so records
+# running on the pool take turns inside it
+PDFIUM_LOCK = threading.Lock()
+
+# Scanned PDFs have no text layer; checking the first pages avoids walking
+# the whole document only to analyze and store empty text
+PDF_PROBE_PAGES = 3
+PDF_MIN_TEXT_CHARS = 100
+
+# Plain-text uploads are decoded and counted in blocks of about this many bytes
+TEXT_BLOCK_SIZE = 1024 * 1024
+
+# BatchWriteItem accepts at most 25 put requests
+DYNAMO_BATCH_SIZE = 25
+
+# SNS rejects messages over 256 KB; leave headroom for the envelope
+SNS_MESSAGE_LIMIT = 250_000
+
+# Blocks must end on line boundaries, so no word or line is split between them
+def analyze_blocks(blocks):
+    # One Counter gives total, unique and top words; lowercasing per token
+    # avoids copying the whole text
+    counts = Counter()
+    total_lines = 0
+    for block in blocks:
+        counts.update(map(str.lower, WORD_RE.findall(block)))
+        total_lines += len(block.splitlines())
+    return {
+        'total_words': sum(counts.values()),
+        'unique_words': len(counts),
+        'top_words': counts.most_common(5),
+        'total_lines': total_lines
+    }
+
+def analyze_text(text):
+    return analyze_blocks((text,))
+
+# Decode a response body in ~TEXT_BLOCK_SIZE pieces, each completed to the end of its line
+def text_blocks(body):
+    stream = codecs.getreader('utf-8')(body)
+    while True:
+        block = stream.read(TEXT_BLOCK_SIZE)
+        if not block:
+            return
+        yield block + stream.readline()
+
+# Marshal a str/int/list value into DynamoDB's typed attribute format
+def to_attr(value):
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, int):
+        return {'N': str(value)}
+    return {'L': [to_attr(v) for v in value]}
+
+def to_item(item):
+    return {name: to_attr(value) for name, value in item.items()}
+
+# Write up to 25 put requests, resending throttled leftovers with backoff
+def write_batch(requests):
+    for attempt in range(8):
+        response = dynamodb.batch_write_item(RequestItems={DYNAMO_TABLE: requests})
+        requests = response.get('UnprocessedItems', {}).get(DYNAMO_TABLE)
+        if not requests:
+            return
+        time.sleep(min(2, 0.05 * 2 ** attempt))
+    raise RuntimeError(f"{len(requests)} item(s) still unprocessed after retries")
+
+# Extract a PDF's text, or None if its first pages show there is no text layer
+def pdf_text(pdf):
+    page_text = lambda i: pdf[i].get_textpage().get_text_range()
+    probe = [page_text(i) for i in range(min(len(pdf), PDF_PROBE_PAGES))]
+    if sum(len(t.strip()) for t in probe) < PDF_MIN_TEXT_CHARS:
+        return None
+    return "\n".join(chain(probe, map(page_text, range(len(probe), len(pdf)))))
+
+# Pack whole lines into messages that each fit under SNS_MESSAGE_LIMIT bytes
+def split_message(message):
+    chunks, current, size = [], [], 0
+    for line in message.split("\n"):
+        line_size = len(line.encode('utf-8')) + 1
+        if current and size + line_size > SNS_MESSAGE_LIMIT:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += line_size
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+# Download a whole object (PDFs need random access); large ones are fetched as concurrent byte ranges
+def read_object(bucket, key, size):
+    if size <= RANGE_GET_THRESHOLD:
+        return s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    def fetch(start):
+        end = min(start + RANGE_PART_SIZE, size) - 1
+        return s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")['Body'].read()
+    with ThreadPoolExecutor(max_workers=RANGE_GET_WORKERS) as executor:
+        return b"".join(executor.map(fetch, range(0, size, RANGE_PART_SIZE)))
+
+# Analyze one uploaded object and return its summary text
+def process_record(record):
+    src_bucket = record['s3']['bucket']['name']
+    key = record['s3']['object']['key']
+    size = record['s3']['object'].get('size', 0)
+
+    file_lower = key.lower()
+    # Decide on the extension before paying for the download
+    if not file_lower.endswith(SUPPORTED_SUFFIXES):
+        return f"File: {key}\nSkipped unsupported file type."
+
+    try:
+        analysis_results = []
+
+        if file_lower.endswith(".csv"):
+            # Decode rows straight off the response stream so parsing starts
+            # before the download finishes and the file is never held whole
+            obj = s3.get_object(Bucket=src_bucket, Key=key)
+            stream = codecs.getreader('utf-8')(obj['Body'])
+            head = stream.read(1024)
+            sniffer = csv.Sniffer()
+            dialect = sniffer.sniff(head)
+            # Finish the partial last line of the sample before handing over the stream
+            first_lines = StringIO(head + stream.readline())
+            # Plain rows rather than DictReader: only the values are used, so
+            # building a dict per row is wasted work
+            reader = csv.reader(chain(first_lines, stream), delimiter=dialect.delimiter)
+            next(reader, None)  # header
+            rows = (row for row in reader if row)
+            # Rows are buffered into 25-item BatchWriteItem calls
+            batch = []
+            for i, row in enumerate(rows):
+                row_text = ' '.join(row)
+                analysis = analyze_text(row_text)
+                analysis['row_number'] = i + 1
+                batch.append({'PutRequest': {'Item': to_item({'id': f"{key}_row{i+1}", **analysis})}})
+                if len(batch) == DYNAMO_BATCH_SIZE:
+                    write_batch(batch)
+                    batch = []
+                analysis_results.append(f"Row {i+1}: {analysis}")
+            if batch:
+                write_batch(batch)
+        elif file_lower.endswith(".txt"):
+            # Counted block by block as the body arrives, so the text is never
+            # held whole and analysis overlaps the download
+            obj = s3.get_object(Bucket=src_bucket, Key=key)
+            analysis = analyze_blocks(text_blocks(obj['Body']))
+            dynamodb.put_item(TableName=DYNAMO_TABLE, Item=to_item({'id': key, **analysis}))
+            analysis_results.append(str(analysis))
+        elif file_lower.endswith(".pdf"):
+            # PDFium extracts text natively, several times faster than pure-Python
+            # parsers; it needs random access, so PDFs are read whole. The
+            # download happens outside the lock so it overlaps other records.
+            content = read_object(src_bucket, key, size)
+            # Imported on first use: loading the PDFium library is the biggest
+            # init cost, and TXT/CSV-only containers never need it
+            import pypdfium2 as pdfium
+            with PDFIUM_LOCK:
+                try:
+                    pdf = pdfium.PdfDocument(content)
+                except pdfium.PdfiumError:
+                    return f"File: {key}\nSkipped encrypted or unreadable PDF."
+                try:
+                    text = pdf_text(pdf)
+                finally:
+                    pdf.close()
+            if text is None:
+                return f"File: {key}\nSkipped PDF without a text layer (scanned or image-only)."
+            analysis = analyze_text(text)
+            dynamodb.put_item(TableName=DYNAMO_TABLE, Item=to_item({'id': key, **analysis}))
+            analysis_results.append(str(analysis))
+
+        return f"File: {key}\n" + "\n".join(analysis_results)
+
+    except Exception as e:
+        return f"File: {key} - Failed: {e}"
+
+def lambda_handler(event, context):
+    # Scheduled keep-warm ping: the container is now warm, nothing to process
+    if event.get("warmer"):
+        return {'statusCode': 200, 'body': 'warmed'}
+
+    records = event.get("Records", [])
+    # Records are dominated by S3/DynamoDB I/O, so process them concurrently;
+    # map() keeps the summary in event order
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(records)))) as executor:
+        summary = list(executor.map(process_record, records))
+
+        if summary:
+            # Large CSV batches can outgrow one SNS message, so the summary is
+            # split and the parts are published concurrently
+            chunks = split_message("\n\n".join(summary))
+            subject = f"File Analysis Summary ({len(records)} file(s))"
+            publishes = [executor.submit(
+                sns.publish,
+                TopicArn=SNS_TOPIC_ARN,
+                Subject=subject if len(chunks) == 1 else f"{subject} part {i}/{len(chunks)}",
+                Message=chunk
+            ) for i, chunk in enumerate(chunks, 1)]
+            for future in publishes:
+                future.result()
+
+    return {'statusCode': 200, 'body': 'Processing complete and summary sent.'}